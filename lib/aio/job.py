@@ -117,10 +117,11 @@ async def run_container(job: Job, subject: Subject, ctx: JobContext, log: LogStr
             try:
                 # Log data until we hit EOF
                 assert container.stdout is not None
+                stdout_is_tty = os.isatty(1)
                 async for block in read_utf8(container.stdout):
                     log.write(block)
                     if ctx.debug:
-                        if os.isatty(1):
+                        if stdout_is_tty:
                             sys.stdout.write(f'\033[34m{block}\033[0m')  # da ba dee, da ba di...
                         else:
                             sys.stdout.write(block)
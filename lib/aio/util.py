@@ -116,8 +116,10 @@ async def gather_and_cancel(aws: Collection[Coroutine[None, None, None]]) -> Non
         (done,), tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
         done.result()  # to raise the exception, if applicable
     finally:
+        # cancel everything first, so that the tasks clean up concurrently
         for task in tasks:
             task.cancel()
+        for task in tasks:
             with contextlib.suppress(asyncio.CancelledError):
                 await task
 
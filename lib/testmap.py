@@ -15,8 +15,10 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with Cockpit; If not, see <http://www.gnu.org/licenses/>.
 
+import functools
 import itertools
-import os.path
+import os
+import sys
 from collections.abc import Iterable, Mapping, Sequence
 
 from lib.constants import TEST_OS_DEFAULT
@@ -25,11 +27,22 @@ COCKPIT_SCENARIOS = {'networking', 'storage', 'expensive', 'other'}
 ANACONDA_SCENARIOS = {'expensive', 'other'}
 
 
+# sorted once, so that all images share the same scenario tuples and get a stable context order
+_COCKPIT_SCENARIOS = tuple(sorted(COCKPIT_SCENARIOS))
+_COCKPIT_SCENARIOS_NO_STORAGE = tuple(s for s in _COCKPIT_SCENARIOS if s != 'storage')
+_ANACONDA_SCENARIOS = tuple(sorted(ANACONDA_SCENARIOS))
+
+
 def contexts(image: str, *scenarios: Iterable[str], repo: str | None = None) -> Sequence[str]:
     return [image + '/' + '-'.join(i) + (('@' + repo) if repo else '')
             for i in itertools.product(*scenarios)]
 
 
+# single-dimension shortcut for contexts()
+def _per_image(image: str, scenarios: Sequence[str] = _COCKPIT_SCENARIOS) -> Sequence[str]:
+    return [f'{image}/{s}' for s in scenarios]
+
+
 REPO_BRANCH_CONTEXT: Mapping[str, Mapping[str, Sequence[str]]] = {
     'cockpit-project/bots': {
         # currently no tests outside of GitHub actions, but declares primary branch
@@ -41,30 +54,30 @@ REPO_BRANCH_CONTEXT: Mapping[str, Mapping[str, Sequence[str]]] = {
     },
     'cockpit-project/cockpit': {
         'main': [
-            *contexts('arch', COCKPIT_SCENARIOS),
+            *_per_image('arch'),
             # cockpit-storaged not yet installed and tests not yet enabled
-            *contexts('centos-9-bootc', COCKPIT_SCENARIOS - {'storage'}),
-            *contexts('debian-stable', COCKPIT_SCENARIOS),
-            *contexts('debian-testing', COCKPIT_SCENARIOS),
-            *contexts('ubuntu-2204', COCKPIT_SCENARIOS),
-            *contexts('ubuntu-2404', COCKPIT_SCENARIOS),
-            *contexts('ubuntu-stable', COCKPIT_SCENARIOS),
-            *contexts('fedora-40', COCKPIT_SCENARIOS),
-            *contexts('fedora-41', COCKPIT_SCENARIOS),
+            *_per_image('centos-9-bootc', _COCKPIT_SCENARIOS_NO_STORAGE),
+            *_per_image('debian-stable'),
+            *_per_image('debian-testing'),
+            *_per_image('ubuntu-2204'),
+            *_per_image('ubuntu-2404'),
+            *_per_image('ubuntu-stable'),
+            *_per_image('fedora-40'),
+            *_per_image('fedora-41'),
             # this runs coverage, reports need the whole test suite
             *contexts(TEST_OS_DEFAULT, ['devel']),
-            *contexts(TEST_OS_DEFAULT, ['firefox'], COCKPIT_SCENARIOS),
+            *contexts(TEST_OS_DEFAULT, ['firefox'], _COCKPIT_SCENARIOS),
             # no udisks on CoreOS → skip storage
-            *contexts('fedora-coreos', COCKPIT_SCENARIOS - {'storage'}),
-            *contexts('rhel-8-10', ['ws-container'], COCKPIT_SCENARIOS),
-            *contexts('rhel-9-6', COCKPIT_SCENARIOS),
-            *contexts('rhel-10-0', COCKPIT_SCENARIOS),
-            *contexts('centos-10', COCKPIT_SCENARIOS),
+            *_per_image('fedora-coreos', _COCKPIT_SCENARIOS_NO_STORAGE),
+            *contexts('rhel-8-10', ['ws-container'], _COCKPIT_SCENARIOS),
+            *_per_image('rhel-9-6'),
+            *_per_image('rhel-10-0'),
+            *_per_image('centos-10'),
         ],
         'rhel-8': [
-            *contexts('rhel-8-10', COCKPIT_SCENARIOS),
+            *_per_image('rhel-8-10'),
             # all skipped
-            *contexts('rhel-8-10-distropkg', COCKPIT_SCENARIOS - {'networking'}),
+            *_per_image('rhel-8-10-distropkg', sorted(COCKPIT_SCENARIOS - {'networking'})),
         ],
         # These can be triggered manually with bots/tests-trigger
         '_manual': [
@@ -221,8 +234,8 @@ REPO_BRANCH_CONTEXT: Mapping[str, Mapping[str, Sequence[str]]] = {
     },
     'rhinstaller/anaconda-webui': {
         'main': [
-            *contexts('fedora-rawhide-boot', ANACONDA_SCENARIOS),
-            *contexts('fedora-rawhide-boot', ['efi'], ANACONDA_SCENARIOS),
+            *_per_image('fedora-rawhide-boot', _ANACONDA_SCENARIOS),
+            *contexts('fedora-rawhide-boot', ['efi'], _ANACONDA_SCENARIOS),
         ],
         '_manual': [
             'fedora-eln-boot',
@@ -230,6 +243,13 @@ REPO_BRANCH_CONTEXT: Mapping[str, Mapping[str, Sequence[str]]] = {
     },
 }
 
+# the test map is static: freeze the context lists, so that they can be shared without copying; many
+# contexts are built at runtime and repeat across projects and branches, so intern them to only keep one copy
+REPO_BRANCH_CONTEXT = {
+    repo: {branch: tuple(map(sys.intern, contexts)) for branch, contexts in branch_contexts.items()}
+    for repo, branch_contexts in REPO_BRANCH_CONTEXT.items()
+}
+
 # The OSTree variants can't build their own packages, so we build in
 # their non-Atomic siblings.
 OSTREE_BUILD_IMAGE = {
@@ -238,8 +258,8 @@ OSTREE_BUILD_IMAGE = {
 }
 
 # only put auxiliary images here; triggers for primary OS images are computed from testmap
-IMAGE_REFRESH_TRIGGERS = {
-    "services": [
+IMAGE_REFRESH_TRIGGERS: Mapping[str, frozenset[str]] = {
+    "services": frozenset({
         *contexts(TEST_OS_DEFAULT, COCKPIT_SCENARIOS, repo='cockpit-project/cockpit'),
         *contexts(TEST_OS_DEFAULT, ['firefox'], COCKPIT_SCENARIOS, repo='cockpit-project/cockpit'),
         *contexts('ubuntu-stable', COCKPIT_SCENARIOS, repo='cockpit-project/cockpit'),
@@ -248,15 +268,15 @@ IMAGE_REFRESH_TRIGGERS = {
         "rhel-8-10@cockpit-project/cockpit/rhel-8",
         "rhel-8-10@candlepin/subscription-manager/subscription-manager-1.28",
         "rhel-9-6@candlepin/subscription-manager-cockpit",
-    ],
+    }),
     # Anaconda builds in fedora-rawhide and runs tests in fedora-rawhide-boot
-    "fedora-rawhide": [
+    "fedora-rawhide": frozenset({
         *contexts("fedora-rawhide-boot", ANACONDA_SCENARIOS, repo='rhinstaller/anaconda-webui'),
-    ],
+    }),
     # Anaconda payload updates can affect tests
-    "fedora-rawhide-anaconda-payload": [
+    "fedora-rawhide-anaconda-payload": frozenset({
         *contexts("fedora-rawhide-boot", ANACONDA_SCENARIOS, repo='rhinstaller/anaconda-webui'),
-    ],
+    }),
 }
 
 
@@ -270,58 +290,71 @@ def get_build_image(image: str) -> str:
 # some tests have suffixes that run the same image in different modes; map a
 # test context image to an actual physical image name
 def get_test_image(image: str) -> str:
-    return image.replace("-distropkg", "")
+    return image.removesuffix("-distropkg")
 
 
 def split_context(context: str) -> 'tuple[str, int | None, str, str]':
+    # common case: just image/scenario, without bots PR or repo
+    if '@' not in context:
+        return (context, None, '', '')
+
     bots_pr = None
     repo_branch = ""
 
-    context_parts = context.split("@")
-    image_scenario = context_parts[0]
+    image_scenario, _, rest = context.partition("@")
+    second, has_third, third = rest.partition("@")
 
     # Second part can be be either `bots#<pr_number>` or repo specification
-    if len(context_parts) > 1:
-        if context_parts[1].startswith("bots#"):
-            bots_pr = int(context_parts[1][5:])
-        else:
-            repo_branch = context_parts[1]
+    if second.startswith("bots#"):
+        bots_pr = int(second[5:])
+    else:
+        repo_branch = second
 
-    if len(context_parts) > 2:
-        repo_branch = context_parts[2]
+    if has_third:
+        repo_branch = third
 
-    repo_branch_parts = repo_branch.split('/', 2)
-    return (image_scenario, bots_pr, '/'.join(repo_branch_parts[:2]), ''.join(repo_branch_parts[2:]))
+    # repo is `owner/name`, the rest is the branch (which can contain slashes)
+    owner, slash, rest = repo_branch.partition('/')
+    name, _, branch = rest.partition('/')
+    return (image_scenario, bots_pr, owner + slash + name, branch)
 
 
+@functools.lru_cache(maxsize=4096)
 def is_valid_context(context: str, repo: str) -> bool:
     image_scenario, _bots_pr, context_repo, branch = split_context(context)
-    image = image_scenario.split('/')[0]
-    # if the context specifies a repo, use that one instead
-    branch_contexts = tests_for_project(context_repo or repo)
+    image = image_scenario.partition('/')[0]
     if context_repo:
         # if the context specifies a repo, only look at that particular branch
         try:
-            repo_images = {c.split('/')[0] for c in branch_contexts[branch or get_default_branch(context_repo)]}
+            # this also includes the _manual tests
+            repo_images = _REPO_BRANCH_IMAGES[context_repo, branch or get_default_branch(context_repo)]
         except KeyError:
             # unknown project
             return False
-        # also allow _manual tests
-        repo_images.update(c.split('/')[0] for c in branch_contexts.get('_manual', []))
-    else:
-        # FIXME: if context is just a simple OS/scenario, we don't know which branch
-        # is meant by the caller; accept known contexts from all branches for now
-        repo_images = {c.split('/')[0] for c in itertools.chain(*branch_contexts.values())}
+        return image in repo_images
 
+    # FIXME: if context is just a simple OS/scenario, we don't know which branch
+    # is meant by the caller; accept known contexts from all branches for now
     # Valid contexts are the ones that exist in the given/current repo
-    return image in repo_images
+    return image in _REPO_IMAGES.get(repo, ())
+
+
+def valid_contexts(contexts: Iterable[str], repo: str) -> Sequence[str]:
+    """Return the contexts which are valid for repo, in their original order
+
+    This is equivalent to filtering with is_valid_context(), but looks up the repo's images only once.
+    """
+    repo_images = _REPO_IMAGES.get(repo, frozenset())
+    return [context for context in contexts
+            if (is_valid_context(context, repo) if '@' in context else context.partition('/')[0] in repo_images)]
 
 
-def projects() -> Iterable[str]:
+def projects() -> Sequence[str]:
     """Return all projects for which we run tests."""
-    return REPO_BRANCH_CONTEXT.keys()
+    return _PROJECTS
 
 
+@functools.cache
 def get_default_branch(repo: str) -> str:
     branches = REPO_BRANCH_CONTEXT[repo]
     if 'main' in branches:
@@ -331,42 +364,86 @@ def get_default_branch(repo: str) -> str:
     raise ValueError(f"repo {repo} does not contain main or master branch")
 
 
+# allow bots/cockpituous integration tests to inject a new context
+_TESTMAP_INJECT = os.getenv("COCKPIT_TESTMAP_INJECT")
+
+
+def _inject(branch_contexts: Mapping[str, Sequence[str]]) -> Mapping[str, Sequence[str]]:
+    if not _TESTMAP_INJECT:
+        return branch_contexts
+    branch, context = _TESTMAP_INJECT.split('/', 1)
+    return {**branch_contexts, branch: (*branch_contexts.get(branch, ()), context)}
+
+
 def tests_for_project(project: str) -> Mapping[str, Sequence[str]]:
     """Return branch -> contexts map."""
-    res = dict(REPO_BRANCH_CONTEXT.get(project, {}))
-    # allow bots/cockpituous integration tests to inject a new context
-    inject = os.getenv("COCKPIT_TESTMAP_INJECT")
-    if inject:
-        branch, context = inject.split('/', 1)
-        res[branch] = [*res.get(branch, ()), context]
-    return res
+    try:
+        return _PROJECT_TESTS[project]
+    except KeyError:
+        return _inject({})
 
 
-def tests_for_image(image: str) -> Sequence[str]:
-    """Return context list of all tests required for testing an image"""
+def _repo_branch_images() -> Mapping[tuple[str, str], frozenset[str]]:
+    """Return (repo, branch) → images of the branch's tests, plus the ones of manual tests"""
 
-    tests = set(IMAGE_REFRESH_TRIGGERS.get(image, []))
+    repo_branch_images = {}
+    for repo in REPO_BRANCH_CONTEXT:
+        branch_contexts = tests_for_project(repo)
+        manual = branch_contexts.get('_manual', ())
+        for branch, contexts in branch_contexts.items():
+            repo_branch_images[repo, branch] = frozenset(
+                c.partition('/')[0] for c in itertools.chain(contexts, manual))
+    return repo_branch_images
+
+
+def _image_tests() -> Mapping[str, Sequence[str]]:
+    """Return image → contexts (with repo and branch) of all non-manual tests"""
+
+    image_tests: dict[str, list[str]] = {}
     for repo, branch_contexts in REPO_BRANCH_CONTEXT.items():
+        default_branch = get_default_branch(repo)
         for branch, contexts in branch_contexts.items():
             if branch.startswith('_'):
                 continue
             for context in contexts:
-                if context.split('/')[0].replace('-distropkg', '') == image:
-                    c = context + '@' + repo
-                    if branch != get_default_branch(repo):
-                        c += "/" + branch
-                    tests.add(c)
+                c = context + '@' + repo
+                if branch != default_branch:
+                    c += "/" + branch
+                image = get_test_image(context.partition('/')[0])
+                image_tests.setdefault(image, []).append(c)
+    return image_tests
+
+
+def _ostree_images() -> Mapping[str, Sequence[str]]:
+    """Return build image → OSTree images which are built in it"""
+
+    ostree_images: dict[str, list[str]] = {}
+    for ostree_image, build_image in OSTREE_BUILD_IMAGE.items():
+        ostree_images.setdefault(build_image, []).append(ostree_image)
+    return ostree_images
+
+
+@functools.cache
+def _tests_for_image_set(image: str) -> frozenset[str]:
+    tests = set(IMAGE_REFRESH_TRIGGERS.get(image, ()))
+    tests.update(_IMAGE_TESTS.get(image, ()))
 
     # is this a build image for Atomic? then add the Atomic tests
-    for a, i in OSTREE_BUILD_IMAGE.items():
-        if image == i:
-            tests.update(tests_for_image(a))
-            break
+    for a in _OSTREE_IMAGES.get(image, ()):
+        tests.update(IMAGE_REFRESH_TRIGGERS.get(a, ()))
+        tests.update(_IMAGE_TESTS.get(a, ()))
 
-    return list(tests)
+    return frozenset(tests)
 
 
-def tests_for_po_refresh(project: str) -> Sequence[str]:
+def tests_for_image(image: str) -> Sequence[str]:
+    """Return context list of all tests required for testing an image"""
+
+    # fresh list, callers may modify it
+    return list(_tests_for_image_set(image))
+
+
+def _po_refresh_tests(project: str) -> Sequence[str]:
     # by default, run all tests
     contexts = REPO_BRANCH_CONTEXT.get(project, {}).get(get_default_branch(project), [])
     # cockpit's are expensive, so only run a few
@@ -376,3 +453,31 @@ def tests_for_po_refresh(project: str) -> Sequence[str]:
         # plus required f-coreos
         contexts.append("fedora-coreos/other")
     return contexts
+
+
+def tests_for_po_refresh(project: str) -> Sequence[str]:
+    return _PO_REFRESH_TESTS[project]
+
+
+_PROJECTS = tuple(REPO_BRANCH_CONTEXT)
+
+# project → branch → contexts, including the injected one; precomputed for tests_for_project()
+_PROJECT_TESTS = {project: _inject(branch_contexts) for project, branch_contexts in REPO_BRANCH_CONTEXT.items()}
+
+# (repo, branch) → images which are valid on that branch; precomputed for is_valid_context()
+_REPO_BRANCH_IMAGES = _repo_branch_images()
+
+# repo → images which have tests on any branch
+_REPO_IMAGES = {
+    repo: frozenset(c.partition('/')[0] for c in itertools.chain.from_iterable(tests_for_project(repo).values()))
+    for repo in REPO_BRANCH_CONTEXT
+}
+
+# project → contexts to trigger for a translations update
+_PO_REFRESH_TESTS = {project: tuple(_po_refresh_tests(project)) for project in REPO_BRANCH_CONTEXT}
+
+# image → contexts which test it; precomputed for tests_for_image()
+_IMAGE_TESTS = _image_tests()
+
+# build image → OSTree images which are built in it; precomputed for tests_for_image()
+_OSTREE_IMAGES = _ostree_images()
@@ -20,7 +20,7 @@ import os
 import re
 import subprocess
 from collections.abc import Collection, Mapping, Sequence
-from functools import cached_property
+from functools import cache, cached_property
 
 from lib.constants import BOTS_DIR, DEFAULT_IDENTITY_FILE, OSTREE_IMAGES
 
@@ -55,6 +55,16 @@ chcon -v unconfined_u:object_r:net_conf_t:s0 /etc/resolv2.conf 2> /dev/null || t
 mv /etc/resolv2.conf /etc/resolv.conf
 """
 
+# journal match which already specifies a field, like "_SYSTEMD_UNIT=cockpit.service"
+JOURNAL_FIELD_RE = re.compile(r"[a-zA-Z0-9_]+=")
+
+
+# ssh refuses keys which others can read, but git does not keep that permission; tests create lots of machines,
+# so only do this once per process
+@cache
+def fix_default_identity_permissions() -> None:
+    os.chmod(DEFAULT_IDENTITY_FILE, 0o600)
+
 
 class Machine(ssh_connection.SSHConnection):
     web_port: int | str
@@ -76,7 +86,7 @@ class Machine(ssh_connection.SSHConnection):
         identity_file = identity_file or DEFAULT_IDENTITY_FILE
 
         if identity_file_old is None:
-            os.chmod(identity_file, 0o600)
+            fix_default_identity_permissions()
         if ":" in address:
             ssh_address, _, ssh_port = address.rpartition(":")
         else:
@@ -174,12 +184,8 @@ class Machine(ssh_connection.SSHConnection):
     def journal_messages(self, matches: Collection[str], log_level: int, cursor: str | None = None) -> list[str]:
         """Return interesting journal messages"""
 
-        # give the OS some time to write pending log messages, to make
-        # unexpected message detection more reliable
-        self.execute("sleep 1; journalctl --sync")
-
         # Prepend "SYSLOG_IDENTIFIER=" as a default field, for backwards compatibility
-        filters = (m if re.match(r"[a-zA-Z0-9_]+=", m) else "SYSLOG_IDENTIFIER=" + m for m in matches)
+        filters = (m if JOURNAL_FIELD_RE.match(m) else "SYSLOG_IDENTIFIER=" + m for m in matches)
 
         # Some versions of journalctl terminate unsuccessfully when
         # the output is empty.  We work around this by ignoring the
@@ -191,7 +197,10 @@ class Machine(ssh_connection.SSHConnection):
         else:
             cursor_arg = ""
 
-        cmd = "journalctl 2>&1 %s -o cat -p %d %s || true" % (cursor_arg, log_level, " + ".join(filters))
+        # give the OS some time to write pending log messages, to make
+        # unexpected message detection more reliable; do that in the same ssh call as the query
+        cmd = "sleep 1; journalctl --sync; journalctl 2>&1 %s -o cat -p %d %s || true" % (
+            cursor_arg, log_level, " + ".join(filters))
         messages = self.execute(cmd).splitlines()
         if len(messages) == 1 and \
            ("Cannot assign requested address" in messages[0] or "-- No entries --" in messages[0]):
@@ -17,6 +17,7 @@
 
 import contextlib
 import fcntl
+import functools
 import os
 import shlex
 import socket
@@ -41,6 +42,12 @@ sys.path.insert(1, BOTS_DIR)
 MEMORY_MB = 1152
 
 
+# this does not change while we run, and tests start a lot of machines
+@functools.cache
+def have_kvm() -> bool:
+    return os.path.exists("/dev/kvm")
+
+
 # based on http://stackoverflow.com/a/17753573
 # we use this to quieten down calls
 @contextlib.contextmanager
@@ -361,7 +368,8 @@ class VirtMachine(Machine):
                     cmd.extend(['-F', 'raw'])
             image_to_use = self._transient_image.name
             cmd.append(image_to_use)
-            self.message(shlex.join(cmd))
+            if self.verbose:
+                self.message(shlex.join(cmd))
             subprocess.check_call(cmd)
         else:
             image_to_use = self.image_file
@@ -386,12 +394,12 @@ class VirtMachine(Machine):
         else:
             keys["firmware"] = ""
 
-        if os.path.exists("/dev/kvm"):
+        if have_kvm():
             keys["type"] = "kvm"
             keys["cpu"] = TEST_KVM_XML.format(**keys)
         else:
-            sys.stderr.write("WARNING: Starting virtual machine with emulation due to missing KVM\n")
-            sys.stderr.write("WARNING: Machine will run about 10-20 times slower\n")
+            sys.stderr.write("WARNING: Starting virtual machine with emulation due to missing KVM\n"
+                             "WARNING: Machine will run about 10-20 times slower\n")
 
         keys.update(self.networking)
         keys["hostname"] = keys["image"] + '-' + keys["control"].replace(':', '-').replace('.', '-')
@@ -528,7 +536,8 @@ class VirtMachine(Machine):
                     if 'no domain' in str(le) or 'not found' in str(le):
                         break
                     raise
-                time.sleep(1)
+                # isActive() is a cheap local libvirt call; don't add up to a second to every shutdown
+                time.sleep(0.2)
             else:
                 self.print_console_log()
                 raise Failure("Waiting for machine poweroff timed out")
@@ -262,6 +262,10 @@ class SSHConnection:
         return False
 
     def _ensure_ssh_master(self) -> None:
+        # `ssh -O check` only asks the master process whether it is still alive; as we started it ourselves,
+        # we can see that without spawning another ssh for every command
+        if self.ssh_master and self.ssh_process and self.ssh_process.poll() is None:
+            return
         if not self._check_ssh_master():
             self._start_ssh_master()
 
@@ -324,8 +328,10 @@ class SSHConnection:
         )
 
         with timeoutlib.Timeout(seconds=timeout, error_message="Timed out on '%s'" % command, machine=self):
+            # without input, give ssh /dev/null instead of an empty pipe
             res = subprocess.run(command_line,
-                                 input=input.encode("UTF-8") if input else b'',
+                                 input=input.encode("UTF-8") if input else None,
+                                 stdin=None if input else subprocess.DEVNULL,
                                  stdout=stdout, check=check)
 
         return '' if res.stdout is None else res.stdout.decode("UTF-8", "replace")
@@ -368,8 +374,10 @@ class SSHConnection:
 
         cmd += [f"{self.ssh_user}@[{self.ssh_address}]:{dest}"]
 
-        self.message("Uploading", ", ".join(sources))
-        self.message(" ".join([shlex.quote(a) for a in cmd]))
+        # don't format the command lines unless we show them
+        if self.verbose:
+            self.message("Uploading", ", ".join(sources))
+            self.message(shlex.join(cmd))
         try:
             subprocess.check_call(cmd)
         except subprocess.CalledProcessError as e:
@@ -397,8 +405,9 @@ class SSHConnection:
             cmd += ["--verbose"]
         cmd += [f"{self.ssh_user}@[{self.ssh_address}]:{source}", dest]
 
-        self.message("Downloading", source)
-        self.message(" ".join(cmd))
+        if self.verbose:
+            self.message("Downloading", source)
+            self.message(" ".join(cmd))
         subprocess.check_call(cmd)
 
     def download_dir(self, source: str, dest: str, relative_dir: str = TEST_DIR) -> None:
@@ -420,8 +429,9 @@ class SSHConnection:
             cmd += ["--verbose"]
         cmd += [f"{self.ssh_user}@[{self.ssh_address}]:{source}", dest]
 
-        self.message("Downloading", source)
-        self.message(" ".join(cmd))
+        if self.verbose:
+            self.message("Downloading", source)
+            self.message(" ".join(cmd))
         try:
             subprocess.check_call(cmd)
         except subprocess.CalledProcessError:
@@ -444,12 +454,14 @@ class SSHConnection:
         assert dest
         assert self.ssh_address
 
-        self.execute(["mkdir", "-p", os.path.dirname(dest)])
-        self.execute(f"cat {'>>' if append else '>'} {shlex.quote(dest)}", input=content)
+        # do everything in one ssh call; execute() runs this with `set -e`, so this stops at the first failure
+        quoted_dest = shlex.quote(dest)
+        cmd = f"mkdir -p {shlex.quote(os.path.dirname(dest))}; cat {'>>' if append else '>'} {quoted_dest}"
         if owner:
-            self.execute(["chown", owner, dest])
+            cmd += f"; chown {shlex.quote(owner)} {quoted_dest}"
         if perm:
-            self.execute(["chmod", perm, dest])
+            cmd += f"; chmod {shlex.quote(perm)} {quoted_dest}"
+        self.execute(cmd, input=content)
 
     def spawn(self, shell_cmd: str, log_id: str, check: bool = True) -> int:
         """Spawn a process in the test machine.
@@ -75,6 +75,24 @@ def test_is_valid_context() -> None:
     bad("debian-testing@cockpit-project/cockpit/wrongbranch", "cockpit-project/bots")
 
 
+def test_valid_contexts() -> None:
+    contexts = [
+        "debian-testing/newscen",
+        "wrongos",
+        "fedora-rawhide",
+        "debian-testing@cockpit-project/cockpit/wrongbranch",
+        "debian-testing/somescen@cockpit-project/cockpit",
+    ]
+    # same as is_valid_context(), and keeps the order
+    for repo in ["cockpit-project/cockpit", "cockpit-project/bots", "cockpit-project/wrongproject"]:
+        assert testmap.valid_contexts(contexts, repo) == [c for c in contexts if testmap.is_valid_context(c, repo)]
+
+    assert testmap.valid_contexts(contexts, "cockpit-project/cockpit") == [
+        "debian-testing/newscen", "fedora-rawhide", "debian-testing/somescen@cockpit-project/cockpit"
+    ]
+    assert testmap.valid_contexts([], "cockpit-project/cockpit") == []
+
+
 # cockpit uses a dynamic multi-scenario testmap
 # this makes some assumptions about the concrete test map, only use scenarios which don't change often
 def test_cockpit_contexts() -> None:
@@ -91,3 +109,45 @@ def test_cockpit_contexts() -> None:
     # scenario options
     assert f"{TEST_OS_DEFAULT}/firefox-expensive" in main_tests
     # devel runs in one scenario due to coverage
+
+
+def test_image_refresh_triggers() -> None:
+    for image, triggers in testmap.IMAGE_REFRESH_TRIGGERS.items():
+        for context in triggers:
+            # catches accidentally concatenated string literals, like a missing comma
+            assert context.count("@") == 1, f"malformed trigger {context} for image {image}"
+            _image_scenario, _bots_pr, repo, _branch = testmap.split_context(context)
+            assert testmap.is_valid_context(context, repo), f"unknown trigger {context} for image {image}"
+
+
+def test_tests_for_po_refresh() -> None:
+    # cockpit only runs the RHEL tests plus the required fedora-coreos one
+    cockpit_tests = testmap.tests_for_po_refresh("cockpit-project/cockpit")
+    assert cockpit_tests
+    assert all(c.startswith("rhel-") for c in cockpit_tests[:-1])
+    assert cockpit_tests[-1] == "fedora-coreos/other"
+    # other projects run all tests of their default branch
+    assert testmap.tests_for_po_refresh("cockpit-project/cockpit-podman") == \
+        tuple(testmap.REPO_BRANCH_CONTEXT["cockpit-project/cockpit-podman"]["main"])
+
+
+def test_tests_for_image() -> None:
+    # this makes some assumptions about the concrete test map, only use scenarios which don't change often
+    assert testmap.tests_for_image("wrongos") == []
+
+    tests = testmap.tests_for_image("rhel-8-10")
+    # default branch has no branch suffix
+    assert "rhel-8-10@cockpit-project/cockpit-podman" in tests
+    # other branches do
+    assert "rhel-8-10/other@cockpit-project/cockpit/rhel-8" in tests
+    # -distropkg variants run on the same image
+    assert "rhel-8-10-distropkg/other@cockpit-project/cockpit/rhel-8" in tests
+    # _manual contexts are not triggered
+    assert "opensuse-tumbleweed@cockpit-project/cockpit" not in testmap.tests_for_image("opensuse-tumbleweed")
+
+    # OSTree images are built in their classic siblings
+    for ostree_image, build_image in testmap.OSTREE_BUILD_IMAGE.items():
+        assert set(testmap.tests_for_image(ostree_image)) <= set(testmap.tests_for_image(build_image))
+
+    # auxiliary images
+    assert set(testmap.tests_for_image("services")) >= testmap.IMAGE_REFRESH_TRIGGERS["services"]